@@ -1,13 +1,17 @@
 import concurrent.futures
-import ipaddress
+import json
 import re
 import time
 from typing import List, Tuple, Optional, Dict
 import shutil
 from datetime import datetime
 
+import openpyxl
 import pandas as pd
 import paramiko
+import xlsxwriter
+
+from excel_io import EXCEL_READ_ENGINE, XLSX_OPTIONS
 
 # --------------------------------------------------
 # Configuration
@@ -16,11 +20,15 @@ EXCEL_PATH = 'final_customer_data.xlsx'  # Source workbook
 EXCEL_IP_COLUMN = 'K'  # Excel column letter containing IPs
 OUTPUT_EXCEL = 'device_config_results.xlsx'
 FAILED_LIST_TXT = 'device_config_failed_ips.txt'
-MAX_WORKERS = 15
+CREDENTIAL_CACHE_JSON = 'device_config_credentials.json'  # ip -> last working (username, password)
+MAX_WORKERS = 100  # hosts probed in parallel; threads mostly wait on the network, not the CPU
 SSH_TIMEOUT = 8  # seconds per credential attempt
 COMMAND_IDENTITY = '/system identity print'
 COMMAND_WIRELESS = '/interface wireless print detail without-paging'
 COMMAND_WIRELESS_ALT = '/interface wifiwave2 print detail without-paging'
+# Cheap probes (single integer) run before the detail prints above
+COMMAND_WIRELESS_COUNT = '/interface wireless print count-only'
+COMMAND_WIRELESS_ALT_COUNT = '/interface wifiwave2 print count-only'
 # Fallback full export (heavy); used only if parsing fails
 COMMAND_EXPORT = '/export terse'
 
@@ -32,10 +40,30 @@ CREDENTIALS: List[Tuple[str, str]] = [
     ('admin', 'admin'),
 ]
 
-# Add result merge column names
-RESULT_COLUMNS = [
-    'ssh_status', 'ssh_username', 'ssh_password', 'system_identity', 'wireless_ssids', 'radio_names', 'ssh_error'
-]
+# Remembered working credential per IP; loaded and saved by main()
+CREDENTIAL_CACHE: Dict[str, Tuple[str, str]] = {}
+
+# Columns of the device_config_results sheets, in order
+OUTPUT_FIELDS = ['ip', 'status', 'username', 'password', 'system_identity', 'ssids', 'radio_names', 'error', 'seconds']
+
+# Result fields -> column names used when merging back into the source workbook
+RESULT_FIELD_MAP = {
+    'status': 'ssh_status',
+    'username': 'ssh_username',
+    'password': 'ssh_password',
+    'system_identity': 'system_identity',
+    'ssids': 'wireless_ssids',
+    'radio_names': 'radio_names',
+    'error': 'ssh_error',
+}
+RESULT_COLUMNS = list(RESULT_FIELD_MAP.values())
+
+# Precompiled patterns used in per-row / per-line loops
+# [0-9] rather than \d: \d also matches non-ASCII digits such as Arabic-Indic ones
+_IP_RE = re.compile(r'([0-9]+\.[0-9]+\.[0-9]+\.[0-9]+)')
+# No leading zeros: getaddrinfo would read an octet like '010' as octal and connect elsewhere
+_IPV4_RE = re.compile(r'^(25[0-5]|2[0-4][0-9]|1[0-9][0-9]|[1-9]?[0-9])(\.(25[0-5]|2[0-4][0-9]|1[0-9][0-9]|[1-9]?[0-9])){3}$')
+_NAME_SET_RE = re.compile(r'set\s+name=([^\s]+)')
 
 # --------------------------------------------------
 # Helpers
@@ -44,69 +72,126 @@ RESULT_COLUMNS = [
 def load_ip_list(path: str, column_letter: str) -> List[str]:
     """Load unique IPs from a specific Excel column (by letter)."""
     try:
-        df = pd.read_excel(path, usecols=column_letter)
+        df = pd.read_excel(path, usecols=column_letter, dtype=str, engine=EXCEL_READ_ENGINE)
     except Exception as e:
         raise RuntimeError(f'Failed reading {path} column {column_letter}: {e}')
     series = df.iloc[:, 0].dropna().astype(str).str.strip()
-    ips: List[str] = []
-    for val in series:
-        # Extract first IP-like token if cell has extra text
-        m = re.search(r'(\d+\.\d+\.\d+\.\d+)', val)
-        if not m:
-            continue
-        candidate = m.group(1)
-        try:
-            ipaddress.ip_address(candidate)
-            if candidate not in ips:
-                ips.append(candidate)
-        except ValueError:
-            continue
-    return ips
+    # Extract first IP-like token if cell has extra text
+    candidates = series.str.extract(_IP_RE, expand=False).dropna().drop_duplicates()
+    # Keep only syntactically valid IPv4 addresses (each octet 0-255)
+    return candidates[candidates.str.match(_IPV4_RE)].tolist()
 
 
-def ssh_run(ip: str, username: str, password: str, command: str) -> str:
-    """Execute a single command over SSH and return stdout."""
+def ssh_open(ip: str, username: str, password: str) -> paramiko.SSHClient:
+    """Open an authenticated SSH session. Caller is responsible for closing it."""
     client = paramiko.SSHClient()
     client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
     try:
         client.connect(ip, username=username, password=password, timeout=SSH_TIMEOUT, banner_timeout=SSH_TIMEOUT, auth_timeout=SSH_TIMEOUT, look_for_keys=False, allow_agent=False)
-        stdin, stdout, stderr = client.exec_command(command, timeout=SSH_TIMEOUT)
-        out = stdout.read().decode(errors='replace')
-        err = stderr.read().decode(errors='replace')
+    except Exception:
+        client.close()
+        raise
+    return client
+
+
+def ssh_start(client: paramiko.SSHClient, command: str) -> paramiko.Channel:
+    """Start a command on its own channel of an open session without waiting for it."""
+    chan = client.get_transport().open_session(timeout=SSH_TIMEOUT)
+    chan.settimeout(SSH_TIMEOUT)
+    chan.exec_command(command)
+    return chan
+
+
+def read_channel(chan: paramiko.Channel) -> str:
+    """Wait for a started command and return its stdout (stderr if stdout is empty)."""
+    try:
+        out = chan.makefile('rb', -1).read().decode(errors='replace')
+        err = chan.makefile_stderr('rb', -1).read().decode(errors='replace')
         return out if out.strip() else err
     finally:
-        client.close()
+        chan.close()
+
 
+def ssh_exec(client: paramiko.SSHClient, command: str) -> str:
+    """Execute a single command on an open session and return stdout."""
+    return read_channel(ssh_start(client, command))
 
-def try_credentials(ip: str) -> Tuple[Optional[Tuple[str, str]], Dict[str, str], str]:
-    """Attempt all credentials; return first success, gathered command outputs, or failure reason."""
-    for user, pwd in CREDENTIALS:
+
+def start_probes(client: paramiko.SSHClient, commands: Tuple[str, ...]) -> List[paramiko.Channel]:
+    """Start as many commands at once as the device will open channels for; the rest are left to run later."""
+    channels: List[paramiko.Channel] = []
+    for cmd in commands:
         try:
-            # Quick identity run to validate credentials
-            identity_raw = ssh_run(ip, user, pwd, COMMAND_IDENTITY)
-            if not identity_raw:
-                raise RuntimeError('Empty response')
-            # If we got here, credentials worked; collect more
-            outputs = {'identity': identity_raw}
-            try:
-                wireless_raw = ssh_run(ip, user, pwd, COMMAND_WIRELESS)
-            except Exception:
-                wireless_raw = ''
-            if not wireless_raw:
-                try:
-                    wireless_raw = ssh_run(ip, user, pwd, COMMAND_WIRELESS_ALT)
-                except Exception:
-                    wireless_raw = ''
-            outputs['wireless'] = wireless_raw
-            # Optional export only if needed later
-            return (user, pwd), outputs, ''
+            channels.append(ssh_start(client, cmd))
+        except Exception:
+            # Some devices cap channels per session
+            break
+    return channels
+
+
+def collect(client: paramiko.SSHClient, command: str, channels: List[paramiko.Channel], index: int) -> str:
+    """Read the output of a probe from its pre-started channel, or run it now if it couldn't be started."""
+    if index < len(channels):
+        return read_channel(channels[index])
+    return ssh_exec(client, command)
+
+
+def read_count(client: paramiko.SSHClient, command: str, channels: List[paramiko.Channel], index: int) -> Optional[int]:
+    """Read the integer printed by a `print count-only` probe; None if it printed anything else or failed."""
+    try:
+        raw = collect(client, command, channels, index).strip()
+    except Exception:
+        return None
+    return int(raw) if raw.isdigit() else None
+
+
+def try_credentials(ip: str) -> Tuple[Optional[Tuple[str, str]], Optional[paramiko.SSHClient], Dict[str, str], str]:
+    """Attempt all credentials; return first success with its still-open client, gathered command outputs, or failure reason."""
+    last_error = 'Auth/connection failed'
+    cached = CREDENTIAL_CACHE.get(ip)
+    # Try the credential that worked last time first, as long as it is still a configured one
+    attempts = [cached] + [c for c in CREDENTIALS if c != cached] if cached in CREDENTIALS else CREDENTIALS
+    for user, pwd in attempts:
+        try:
+            client = ssh_open(ip, user, pwd)
         except paramiko.AuthenticationException:
             continue
         except Exception as e:
-            # Connection or exec failure; try next credential
+            # Connection failure; try next credential
             last_error = str(e)
             continue
-    return None, {}, locals().get('last_error', 'Auth/connection failed')
+        # Login succeeded; issue every probe at once as separate channels on the same transport
+        probes = (COMMAND_IDENTITY, COMMAND_WIRELESS_COUNT, COMMAND_WIRELESS_ALT_COUNT)
+        channels = start_probes(client, probes)
+        try:
+            try:
+                identity_raw = collect(client, COMMAND_IDENTITY, channels, 0)
+                if not identity_raw:
+                    raise RuntimeError('Empty response')
+            except Exception as e:
+                # Identity failure; try next credential
+                client.close()
+                last_error = str(e)
+                continue
+            # Credential is good from here on; failures below only cost wireless data
+            outputs = {'identity': identity_raw}
+            counts = [read_count(client, cmd, channels, i) for i, cmd in enumerate(probes[1:], start=1)]
+        finally:
+            for chan in channels:
+                chan.close()
+        # Only pull the (possibly large) detail print where interfaces may exist
+        wireless_raw = ''
+        for count, cmd in zip(counts, (COMMAND_WIRELESS, COMMAND_WIRELESS_ALT)):
+            if wireless_raw or count == 0:
+                continue
+            try:
+                wireless_raw = ssh_exec(client, cmd)
+            except Exception:
+                wireless_raw = ''
+        outputs['wireless'] = wireless_raw
+        # Keep the session open so the caller can reuse it for the export fallback
+        return (user, pwd), client, outputs, ''
+    return None, None, {}, last_error
 
 
 def parse_identity(raw: str) -> str:
@@ -115,30 +200,48 @@ def parse_identity(raw: str) -> str:
         if 'name:' in line:
             return line.split('name:', 1)[1].strip()
     # Fallback from export style: set name=MyRouter
-    m = re.search(r'set\s+name=([^\s]+)', raw)
+    m = _NAME_SET_RE.search(raw)
     if m:
         return m.group(1).strip().strip('"')
     return ''
 
 
+def value_after(line: str, key: str) -> str:
+    """Return the value following ``key`` in a RouterOS ``key=value`` line, quotes stripped.
+    Plain string scan equivalent to re.search(key + r'"?([^"\s]+)"?'); '' if there is none.
+    """
+    pos = line.find(key)
+    while pos != -1:
+        tail = line[pos + len(key):]
+        if tail.startswith('"'):
+            tail = tail[1:]
+        if tail and not tail[0].isspace():
+            token = tail.split(None, 1)[0].split('"', 1)[0]
+            if token:
+                return token
+        # Empty value here; like the regex, keep looking further along the line
+        pos = line.find(key, pos + 1)
+    return ''
+
+
 def parse_wireless(raw: str) -> Tuple[str, str]:
     ssids = set()
     radios = set()
     for line in raw.splitlines():
         if 'ssid=' in line:
-            m = re.search(r'ssid="?([^"\s]+)"?', line)
-            if m:
-                ssids.add(m.group(1))
+            ssid = value_after(line, 'ssid=')
+            if ssid:
+                ssids.add(ssid)
         if 'radio-name=' in line:
-            m = re.search(r'radio-name="?([^"\s]+)"?', line)
-            if m:
-                radios.add(m.group(1))
+            radio = value_after(line, 'radio-name=')
+            if radio:
+                radios.add(radio)
     return ';'.join(sorted(ssids)), ';'.join(sorted(radios))
 
 
 def process_ip(ip: str) -> Dict[str, str]:
     start = time.time()
-    cred, outputs, error = try_credentials(ip)
+    cred, client, outputs, error = try_credentials(ip)
     duration = round(time.time() - start, 2)
     if not cred:
         return {
@@ -152,19 +255,22 @@ def process_ip(ip: str) -> Dict[str, str]:
             'error': error,
             'seconds': duration,
         }
-    # If wireless outputs missing, attempt export terse to parse
-    identity_raw = outputs.get('identity', '')
-    wireless_raw = outputs.get('wireless', '')
-    if not wireless_raw:
-        try:
-            export_raw = ssh_run(ip, cred[0], cred[1], COMMAND_EXPORT)
-        except Exception:
-            export_raw = ''
-        if export_raw:
-            # Try to extract ssid and radio-name lines from export
-            for line in export_raw.splitlines():
-                if 'ssid=' in line or 'radio-name=' in line:
-                    wireless_raw += '\n' + line
+    try:
+        # If wireless outputs missing, attempt export terse to parse
+        identity_raw = outputs.get('identity', '')
+        wireless_raw = outputs.get('wireless', '')
+        if not wireless_raw:
+            try:
+                export_raw = ssh_exec(client, COMMAND_EXPORT)
+            except Exception:
+                export_raw = ''
+            if export_raw:
+                # Try to extract ssid and radio-name lines from export
+                for line in export_raw.splitlines():
+                    if 'ssid=' in line or 'radio-name=' in line:
+                        wireless_raw += '\n' + line
+    finally:
+        client.close()
     system_identity = parse_identity(identity_raw)
     ssids, radios = parse_wireless(wireless_raw)
     return {
@@ -180,48 +286,67 @@ def process_ip(ip: str) -> Dict[str, str]:
     }
 
 
+def load_credential_cache(path: str) -> Dict[str, Tuple[str, str]]:
+    """Load remembered credentials (ip -> (username, password)); empty if missing or unreadable."""
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    # Skip entries that aren't a [username, password] pair of strings
+    return {
+        ip: (cred[0], cred[1])
+        for ip, cred in data.items()
+        if isinstance(cred, list) and len(cred) == 2 and all(isinstance(v, str) for v in cred)
+    }
+
+
+def save_credential_cache(path: str, cache: Dict[str, Tuple[str, str]]):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({ip: list(cred) for ip, cred in sorted(cache.items())}, f, indent=2)
+
+
 def column_letter_to_index(letter: str) -> int:
     letter = letter.upper()
     return ord(letter) - ord('A')
 
 
-def merge_results_into_source(results_df: pd.DataFrame, source_path: str, ip_column_letter: str):
-    """Merge results back into the original Excel workbook, adding new columns.
+def merge_results_into_source(results: Dict[str, Dict[str, str]], source_path: str, ip_column_letter: str):
+    """Merge results (ip -> {result column: value}) back into the original Excel workbook, adding new columns.
+    Only the result cells are written, in place, so other columns keep their formulas and styles.
     Creates a timestamped backup before overwriting.
     """
     backup = f"{source_path}.bak_{datetime.now():%Y%m%d_%H%M%S}"
     shutil.copyfile(source_path, backup)
     print(f"Backup created: {backup}")
-    # Load entire sheet
-    master_df = pd.read_excel(source_path)
-    ip_col_idx = column_letter_to_index(ip_column_letter)
-    if ip_col_idx >= master_df.shape[1]:
+    wb = openpyxl.load_workbook(source_path)
+    ws = wb.worksheets[0]  # the sheet pd.read_excel reads by default
+    ip_col = column_letter_to_index(ip_column_letter) + 1
+    if ip_col > ws.max_column:
         raise ValueError(f"IP column index derived from letter {ip_column_letter} out of range")
-    # Extract IPs from that column (may contain extra text)
-    ip_series = master_df.iloc[:, ip_col_idx].astype(str)
-    # Build map from IP -> result row
-    result_map = {row['ip']: row for row in results_df.to_dict(orient='records')}
-    # Ensure new columns exist
+    # Reuse result columns from a previous run, append any that are missing
+    header = {cell.value: cell.column for cell in ws[1] if cell.value is not None}
+    next_col = ws.max_column + 1
     for col in RESULT_COLUMNS:
-        if col not in master_df.columns:
-            master_df[col] = ''
-    for i, cell in ip_series.items():
-        m = re.search(r'(\d+\.\d+\.\d+\.\d+)', cell)
+        if col not in header:
+            ws.cell(row=1, column=next_col, value=col)
+            header[col] = next_col
+            next_col += 1
+    for (cell,) in ws.iter_rows(min_row=2, min_col=ip_col, max_col=ip_col):
+        if cell.value is None:
+            continue
+        # IP cell may contain extra text
+        m = _IP_RE.search(str(cell.value))
         if not m:
             continue
-        ip = m.group(1)
-        data = result_map.get(ip)
-        if not data:
+        data = results.get(m.group(1))
+        if data is None:
             continue
-        master_df.at[i, 'ssh_status'] = data['status']
-        master_df.at[i, 'ssh_username'] = data['username']
-        master_df.at[i, 'ssh_password'] = data['password']
-        master_df.at[i, 'system_identity'] = data['system_identity']
-        master_df.at[i, 'wireless_ssids'] = data['ssids']
-        master_df.at[i, 'radio_names'] = data['radio_names']
-        master_df.at[i, 'ssh_error'] = data['error']
-    # Write back
-    master_df.to_excel(source_path, index=False)
+        for col in RESULT_COLUMNS:
+            ws.cell(row=cell.row, column=header[col], value=data[col])
+    wb.save(source_path)
     print(f"Merged results into {source_path}")
 
 
@@ -232,26 +357,41 @@ def merge_results_into_source(results_df: pd.DataFrame, source_path: str, ip_col
 def main():
     ips = load_ip_list(EXCEL_PATH, EXCEL_IP_COLUMN)
     print(f'Loaded {len(ips)} IPs from {EXCEL_PATH} column {EXCEL_IP_COLUMN}')
-    results: List[Dict[str, str]] = []
-    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
-        for res in pool.map(process_ip, ips):
-            results.append(res)
-            print(f"[{res['status']}] {res['ip']} time={res['seconds']}s identity={res.get('system_identity','')}")
-    df = pd.DataFrame(results)
-    # Separate failed list
-    failed_ips = df.loc[df['status'] != 'OK', 'ip'].tolist()
-    # Write outputs
-    with pd.ExcelWriter(OUTPUT_EXCEL, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='results')
-        df[df['status'] == 'OK'].to_excel(writer, index=False, sheet_name='success')
-        df[df['status'] != 'OK'].to_excel(writer, index=False, sheet_name='failed')
+    CREDENTIAL_CACHE.update(load_credential_cache(CREDENTIAL_CACHE_JSON))
+    # Only the merge-back columns are kept per host; full rows go straight to disk
+    merge_rows: Dict[str, Dict[str, str]] = {}
+    failed_ips: List[str] = []
+    with xlsxwriter.Workbook(OUTPUT_EXCEL, XLSX_OPTIONS) as workbook:
+        sheets = {name: workbook.add_worksheet(name) for name in ('results', 'success', 'failed')}
+        next_row = dict.fromkeys(sheets, 1)
+        for ws in sheets.values():
+            ws.write_row(0, 0, OUTPUT_FIELDS)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+            # Handle hosts as they finish so one hung device doesn't hold back the rest
+            futures = [pool.submit(process_ip, ip) for ip in ips]
+            for fut in concurrent.futures.as_completed(futures):
+                res = fut.result()
+                row = [res[field] for field in OUTPUT_FIELDS]
+                for name in ('results', 'success' if res['status'] == 'OK' else 'failed'):
+                    sheets[name].write_row(next_row[name], 0, row)
+                    next_row[name] += 1
+                merge_rows[res['ip']] = {col: res[field] for field, col in RESULT_FIELD_MAP.items()}
+                if res['status'] == 'OK':
+                    CREDENTIAL_CACHE[res['ip']] = (res['username'], res['password'])
+                else:
+                    failed_ips.append(res['ip'])
+                print(f"[{res['status']}] {res['ip']} time={res['seconds']}s identity={res.get('system_identity','')}")
     if failed_ips:
         with open(FAILED_LIST_TXT, 'w', encoding='utf-8') as f:
             f.write('\n'.join(failed_ips))
     print(f'Written {OUTPUT_EXCEL}. Failed IP count: {len(failed_ips)}')
+    try:
+        save_credential_cache(CREDENTIAL_CACHE_JSON, CREDENTIAL_CACHE)
+    except OSError as e:
+        print(f'Failed saving credential cache: {e}')
     # Merge back into original workbook
     try:
-        merge_results_into_source(df, EXCEL_PATH, EXCEL_IP_COLUMN)
+        merge_results_into_source(merge_rows, EXCEL_PATH, EXCEL_IP_COLUMN)
     except Exception as e:
         print(f'Failed merging back into source workbook: {e}')
 
@@ -0,0 +1,32 @@
+"""
+excel_io.py
+===========
+
+Excel I/O settings shared by the scripts in this repository.
+
+``EXCEL_READ_ENGINE`` is the ``engine=`` to pass to ``pandas.read_excel``: the
+Rust-based ``calamine`` reader when ``python-calamine`` is installed and pandas
+knows the engine (>= 2.2), ``openpyxl`` otherwise. ``XLSX_OPTIONS`` are the
+``xlsxwriter.Workbook`` options used for every report written.
+"""
+
+import pandas as pd
+
+
+def _pick_read_engine() -> str:
+    try:
+        import python_calamine  # noqa: F401
+    except ImportError:
+        return 'openpyxl'
+    try:
+        version = tuple(int(part) for part in pd.__version__.split('.')[:2])
+    except ValueError:
+        # Unparsable version string (e.g. a dev build); stay on the engine every pandas has
+        return 'openpyxl'
+    return 'calamine' if version >= (2, 2) else 'openpyxl'
+
+
+EXCEL_READ_ENGINE = _pick_read_engine()
+
+# Stream rows to disk; keep cell text literal (no formula/URL conversion)
+XLSX_OPTIONS = {'constant_memory': True, 'strings_to_formulas': False, 'strings_to_urls': False}
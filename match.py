@@ -1,8 +1,10 @@
 import os
 import pandas as pd
-from rapidfuzz import process
+from rapidfuzz import fuzz, process, utils
 from datetime import datetime
 
+from excel_io import EXCEL_READ_ENGINE
+
 # ---------------- Configuration ---------------- #
 CONTACTS_XLSX = 'contacts.xlsx'
 CONTACTS_CSV = 'contacts.csv'
@@ -14,7 +16,7 @@ MIN_SCORE = 0  # adjust if you want to filter low scores later
 
 def load_contacts():
     if os.path.exists(CONTACTS_XLSX):
-        df = pd.read_excel(CONTACTS_XLSX)
+        df = pd.read_excel(CONTACTS_XLSX, engine=EXCEL_READ_ENGINE)
         source = CONTACTS_XLSX
     elif os.path.exists(CONTACTS_CSV):
         df = pd.read_csv(CONTACTS_CSV)
@@ -28,7 +30,7 @@ def load_contacts():
 def load_accounts():
     if not os.path.exists(ACCOUNT_NAMES_XLSX):
         raise FileNotFoundError(f"Required file {ACCOUNT_NAMES_XLSX} not found. Place it next to this script.")
-    accounts_df = pd.read_excel(ACCOUNT_NAMES_XLSX)
+    accounts_df = pd.read_excel(ACCOUNT_NAMES_XLSX, engine=EXCEL_READ_ENGINE)
     # Normalize column name possibilities
     if 'Username' not in accounts_df.columns:
         # Try to find a similar column
@@ -50,10 +52,13 @@ def build_username(df: pd.DataFrame) -> pd.DataFrame:
     if not name_columns:
         raise ValueError("No expected name columns found in contacts file.")
     df[name_columns] = df[name_columns].fillna("")
-    df['username'] = df[name_columns].apply(
-        lambda row: " ".join(part for part in (str(v).strip() for v in row) if part), axis=1
-    )
-    df.loc[df['username'] == '', 'username'] = 'N/A'
+    parts = [df[c].astype(str).str.strip() for c in name_columns]
+    username = parts[0]
+    for part in parts[1:]:
+        username = username.str.cat(part, sep=' ')
+    # Empty parts leave runs of spaces behind; collapse them
+    username = username.str.replace(r'\s+', ' ', regex=True).str.strip()
+    df['username'] = username.where(username != '', 'N/A')
     return df
 
 
@@ -92,20 +97,26 @@ def main():
 
     contacts_list = contacts_df['username'].tolist()
     account_names = accounts_df['Username'].tolist()
+    # Normalize the choices once rather than inside every extractOne call
+    contacts_prepped = [utils.default_process(name) for name in contacts_list]
 
     matches = []
     for account in account_names:
         if not contacts_list:
             break
-        match, score, idx = process.extractOne(account, contacts_list)
-        phone_number = contacts_df.loc[idx, 'number'] if idx is not None else ''
-        if score >= MIN_SCORE:
-            matches.append({
-                'account_name': account,
-                'matched_contact': match,
-                'phone_number': phone_number,
-                'similarity_score': score
-            })
+        best = process.extractOne(
+            utils.default_process(account), contacts_prepped,
+            scorer=fuzz.WRatio, processor=None, score_cutoff=MIN_SCORE
+        )
+        if best is None:
+            continue
+        _, score, idx = best
+        matches.append({
+            'account_name': account,
+            'matched_contact': contacts_list[idx],
+            'phone_number': contacts_df.loc[idx, 'number'],
+            'similarity_score': score
+        })
 
     results_df = pd.DataFrame(matches)
     print(results_df)
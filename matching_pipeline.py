@@ -59,10 +59,38 @@ import argparse
 import os
 import re
 from datetime import datetime
-from typing import List, Tuple, Dict
+from typing import List, Tuple
 
+import numpy as np
 import pandas as pd
-from rapidfuzz import fuzz
+import xlsxwriter
+from rapidfuzz import fuzz, process
+
+from excel_io import XLSX_OPTIONS
+
+# Precompiled patterns; these run once per contact row / phone cell
+_WS_RE = re.compile(r"\s+")
+_DIGIT_RE = re.compile(r"\d")
+_ALPHA_RE = re.compile(r"[A-Za-z\u0621-\u064A]")
+_PHONE_CLEAN_RE = re.compile(r"[^0-9+]")
+
+# Contact name columns, in the order they are joined
+NAME_COLUMNS = ["First Name", "Middle Name", "Last Name", "Nickname"]
+# Keywords suggesting a contact entry is a device rather than a person
+FORBIDDEN_NAME_KEYWORDS = [
+    "samsung",
+    "iphone",
+    "series",
+    "watch",
+    "phone",
+    "camera",
+    "gear",
+    "unknown",
+]
+_FORBIDDEN_RE = re.compile("|".join(map(re.escape, FORBIDDEN_NAME_KEYWORDS)))
+
+# Accounts scored per cdist call; bounds the score matrix to this many rows
+MATCH_BLOCK_SIZE = 1024
 
 
 def compile_contact_name(row: pd.Series) -> str:
@@ -83,7 +111,7 @@ def compile_contact_name(row: pd.Series) -> str:
         The assembled name, or an empty string if none available.
     """
     parts: List[str] = []
-    for col in ["First Name", "Middle Name", "Last Name", "Nickname"]:
+    for col in NAME_COLUMNS:
         value = row.get(col)
         if pd.notnull(value) and str(value).strip():
             parts.append(str(value).strip())
@@ -93,7 +121,7 @@ def compile_contact_name(row: pd.Series) -> str:
             parts.append(str(fallback).strip())
     full = " ".join(parts)
     # Normalize whitespace
-    full = re.sub(r"\s+", " ", full).strip()
+    full = _WS_RE.sub(" ", full).strip()
     return full
 
 
@@ -116,25 +144,15 @@ def name_is_valid(name: str) -> bool:
     """
     if not name or name in {".", "--"}:
         return False
-    if re.search(r"\d", name):
+    if _DIGIT_RE.search(name):
         return False
     if len(name) < 3:
         return False
-    forbidden = [
-        "samsung",
-        "iphone",
-        "series",
-        "watch",
-        "phone",
-        "camera",
-        "gear",
-        "unknown",
-    ]
     low = name.lower()
-    for kw in forbidden:
+    for kw in FORBIDDEN_NAME_KEYWORDS:
         if kw in low:
             return False
-    return bool(re.search(r"[A-Za-z\u0621-\u064A]", name))
+    return bool(_ALPHA_RE.search(name))
 
 
 def normalize_phone_number(raw: str, default_country: str = "+961") -> str:
@@ -159,7 +177,7 @@ def normalize_phone_number(raw: str, default_country: str = "+961") -> str:
     """
     if not raw:
         return ""
-    s = re.sub(r"[^0-9+]", "", str(raw))
+    s = _PHONE_CLEAN_RE.sub("", str(raw))
     if s.startswith("+"):
         return s
     if s.startswith("00"):
@@ -168,6 +186,76 @@ def normalize_phone_number(raw: str, default_country: str = "+961") -> str:
     return default_country + s
 
 
+def compile_contact_names(contacts: pd.DataFrame) -> pd.Series:
+    """Vectorized :func:`compile_contact_name` over a whole contacts table.
+
+    Parameters
+    ----------
+    contacts : pandas.DataFrame
+        The contacts table.
+
+    Returns
+    -------
+    pandas.Series
+        One assembled name per row (empty string if none available).
+    """
+
+    def cleaned(col: str) -> pd.Series:
+        if col not in contacts.columns:
+            return pd.Series("", index=contacts.index, dtype=object)
+        return contacts[col].fillna("").astype(str).str.strip()
+
+    full = cleaned(NAME_COLUMNS[0])
+    for col in NAME_COLUMNS[1:]:
+        full = full.str.cat(cleaned(col), sep=" ")
+    full = full.str.strip()
+    full = full.where(full != "", cleaned("File As"))
+    # Empty parts leave runs of spaces behind; collapse them with the rest
+    return full.str.replace(_WS_RE, " ", regex=True).str.strip()
+
+
+def valid_name_mask(names: pd.Series) -> pd.Series:
+    """Vectorized :func:`name_is_valid`.
+
+    Parameters
+    ----------
+    names : pandas.Series
+        Assembled contact names.
+
+    Returns
+    -------
+    pandas.Series of bool
+        True where the name is considered valid.
+    """
+    return (
+        ~names.isin([".", "--"])
+        & (names.str.len() >= 3)
+        & ~names.str.contains(_DIGIT_RE)
+        & ~names.str.lower().str.contains(_FORBIDDEN_RE)
+        & names.str.contains(_ALPHA_RE)
+    )
+
+
+def normalize_phone_numbers(raw: pd.Series, default_country: str = "+961") -> pd.Series:
+    """Vectorized :func:`normalize_phone_number` for non-empty raw values.
+
+    Parameters
+    ----------
+    raw : pandas.Series
+        Raw phone number values.
+    default_country : str
+        The country code to use if the number lacks a country prefix.
+
+    Returns
+    -------
+    pandas.Series
+        The normalized phone numbers.
+    """
+    s = raw.astype(str).str.replace(_PHONE_CLEAN_RE, "", regex=True)
+    local = default_country + s.str.lstrip("0")
+    return local.where(~s.str.startswith("00"), "+" + s.str[2:]).where(~s.str.startswith("+"), s)
+
+
 def parse_contacts(contacts_path: str) -> List[Tuple[str, str]]:
     """Load and parse the contacts CSV into a list of (name, phone) tuples.
 
@@ -184,20 +272,25 @@ def parse_contacts(contacts_path: str) -> List[Tuple[str, str]]:
     """
     contacts = pd.read_csv(contacts_path)
     phone_cols = [c for c in contacts.columns if c.startswith("Phone") and c.endswith("Value")]
-    seen: Dict[str, str] = {}
-    for _, row in contacts.iterrows():
-        name = compile_contact_name(row)
-        if not name_is_valid(name):
-            continue
-        for col in phone_cols:
-            value = row.get(col)
-            if pd.isnull(value) or not str(value).strip():
-                continue
-            phone = normalize_phone_number(value)
-            if phone and phone not in seen:
-                seen[phone] = name
-    # Convert dict to list
-    return [(name, phone) for phone, name in seen.items()]
+    if not phone_cols:
+        return []
+    names = compile_contact_names(contacts)
+    valid = valid_name_mask(names)
+    # One row per (contact, phone column), in row order then column order so
+    # that "first name encountered" matches a row-by-row scan. Object dtype
+    # keeps integer-typed columns from being upcast to float by melt.
+    phones = (
+        contacts.loc[valid, phone_cols]
+        .astype(object)
+        .assign(_name=names[valid])
+        .melt(id_vars="_name", value_vars=phone_cols, value_name="raw", ignore_index=False)
+        .sort_index(kind="stable")
+    )
+    present = phones["raw"].notna() & (phones["raw"].astype(str).str.strip() != "")
+    phones = phones[present]
+    phones = phones.assign(phone=normalize_phone_numbers(phones["raw"]))
+    phones = phones.drop_duplicates("phone", keep="first")
+    return list(zip(phones["_name"], phones["phone"]))
 
 
 def prepare_account_name(row: pd.Series, prefix: str) -> str:
@@ -229,6 +322,26 @@ def prepare_account_name(row: pd.Series, prefix: str) -> str:
     return " ".join(p.title() for p in parts)
 
 
+def token_sort_key(name: str) -> str:
+    """Lower-case a name and sort its whitespace-separated tokens.
+
+    ``fuzz.ratio`` on two keys gives the same score as
+    ``fuzz.token_sort_ratio`` on the lower-cased names, so the tokenizing
+    and sorting is paid once per name rather than once per comparison.
+
+    Parameters
+    ----------
+    name : str
+        An account or contact name.
+
+    Returns
+    -------
+    str
+        The sorted tokens joined by single spaces.
+    """
+    return " ".join(sorted(name.lower().split()))
+
+
 def match_accounts(
     customers_path: str,
     contacts: List[Tuple[str, str]],
@@ -266,26 +379,46 @@ def match_accounts(
     customers["Match Score"] = 0.0
     # Invert contacts into list of (phone, name) for matching
     contact_items = [(phone, name) for name, phone in contacts]
-    # Perform fuzzy matching
-    for idx, row in customers.iterrows():
-        acc_name = row["Account Name"]
-        if not acc_name:
-            continue
-        best_score = 0.0
-        best_phone = ""
-        best_name = ""
-        for phone, name in contact_items:
-            score = fuzz.token_sort_ratio(acc_name.lower(), name.lower())
-            if score > best_score:
-                best_score = score
-                best_phone = phone
-                best_name = name
-        if best_score >= threshold:
-            customers.at[idx, "Matched Phone"] = best_phone
-            customers.at[idx, "Matched Contact Name"] = best_name
-            customers.at[idx, "Match Score"] = best_score
-        else:
-            customers.at[idx, "Match Score"] = best_score
+    # Score every named account against every contact in native code
+    has_name = (customers["Account Name"] != "").to_numpy()
+    if contact_items and has_name.any():
+        # Tokenize and sort each name once; plain ratio on the keys is token_sort_ratio
+        acc_keys = [token_sort_key(name) for name in customers.loc[has_name, "Account Name"]]
+        contact_keys = [token_sort_key(name) for _, name in contact_items]
+        # Intern the keys as integer ids so each distinct key is scored only
+        # once; factorize numbers them in order of first appearance
+        acc_codes, acc_uniques = pd.factorize(np.asarray(acc_keys, dtype=object))
+        contact_codes, contact_uniques = pd.factorize(np.asarray(contact_keys, dtype=object))
+        acc_uniques = list(acc_uniques)
+        contact_uniques = list(contact_uniques)
+        # Position of the first contact carrying each distinct key
+        _, first_contact = np.unique(contact_codes, return_index=True)
+        uniq_idx = np.empty(len(acc_uniques), dtype=np.intp)
+        uniq_score = np.empty(len(acc_uniques), dtype=np.float64)
+        # Score blocks of accounts so only MATCH_BLOCK_SIZE x contacts scores
+        # are held at once; cdist spreads each block across all cores
+        for start in range(0, len(acc_uniques), MATCH_BLOCK_SIZE):
+            stop = start + MATCH_BLOCK_SIZE
+            # float64 keeps the scores identical to per-pair token_sort_ratio calls
+            scores = process.cdist(
+                acc_uniques[start:stop], contact_uniques, scorer=fuzz.ratio, dtype=np.float64, workers=-1
+            )
+            # argmax returns the first distinct key with the top score, and that
+            # key's first contact is the earliest top-scoring contact overall,
+            # as the old loop picked
+            block_idx = scores.argmax(axis=1)
+            uniq_idx[start:stop] = block_idx
+            uniq_score[start:stop] = scores[np.arange(len(block_idx)), block_idx]
+        best_idx = first_contact[uniq_idx[acc_codes]]
+        best_score = uniq_score[acc_codes]
+        # A zero score never replaced the loop's empty default, so it is no match
+        is_match = (best_score >= threshold) & (best_score > 0)
+        rows = customers.index[has_name]
+        phones = np.array([phone for phone, _ in contact_items], dtype=object)
+        names = np.array([name for _, name in contact_items], dtype=object)
+        customers.loc[rows, "Match Score"] = best_score
+        customers.loc[rows[is_match], "Matched Phone"] = phones[best_idx[is_match]]
+        customers.loc[rows[is_match], "Matched Contact Name"] = names[best_idx[is_match]]
     # Identify matched phone numbers
     matched_phones = set(
         customers.loc[customers["Match Score"] >= threshold, "Matched Phone"]
@@ -299,6 +432,30 @@ def match_accounts(
     return customers, leftover
 
 
+def write_excel(df: pd.DataFrame, path: str, sheet_name: str = "Sheet1") -> None:
+    """Write a DataFrame to an Excel file row by row in constant memory.
+
+    ``constant_memory`` workbooks only hold the current row, while pandas'
+    own Excel writer emits cells column by column, so rows are written
+    directly with xlsxwriter.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        The table to write; the header row comes from its columns.
+    path : str
+        Destination ``.xlsx`` path.
+    sheet_name : str
+        Name of the single worksheet.
+    """
+    with xlsxwriter.Workbook(path, XLSX_OPTIONS) as workbook:
+        ws = workbook.add_worksheet(sheet_name)
+        ws.write_row(0, 0, [str(c) for c in df.columns])
+        values = df.astype(object).where(df.notna(), None)
+        for r, row in enumerate(values.itertuples(index=False, name=None), start=1):
+            ws.write_row(r, 0, row)
+
+
 def save_outputs(
     customers: pd.DataFrame,
     leftover: List[Tuple[str, str]],
@@ -332,10 +489,8 @@ def save_outputs(
     leftover_path = os.path.join(
         out_dir, f"leftover_contacts_{iteration_tag}_{timestamp}.xlsx"
     )
-    customers.to_excel(matched_path, index=False)
-    pd.DataFrame(leftover, columns=["Name", "Phone"]).to_excel(
-        leftover_path, index=False
-    )
+    write_excel(customers, matched_path)
+    write_excel(pd.DataFrame(leftover, columns=["Name", "Phone"]), leftover_path)
     return matched_path, leftover_path
 
 